@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-15 21:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ccew", "0008_alter_charityannualreturnhistory_charity_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="charityareaofoperation",
+            name="charity",
+            field=models.ForeignKey(
+                db_column="organisation_number",
+                db_index=False,
+                help_text="The organisation number for the charity. This is the index value for the charity.",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="area_of_operation",
+                to="ccew.charity",
+                to_field="organisation_number",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="charityareaofoperation",
+            index=models.Index(
+                fields=["charity", "registered_charity_number"],
+                name="ccew_charit_organis_f75da6_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="charityareaofoperation",
+            index=models.Index(
+                fields=["geographic_area_type", "geographic_area_description"],
+                name="ccew_charit_geograp_8d6a21_idx",
+            ),
+        ),
+    ]
@@ -16,6 +16,7 @@ class CharityAreaOfOperation(models.Model):
         on_delete=models.CASCADE,
         help_text="The organisation number for the charity. This is the index value for the charity.",
         related_name="area_of_operation",
+        db_index=False,  # covered by the charity/registered_charity_number index
     )
     registered_charity_number = models.IntegerField(
         db_index=True,
@@ -53,3 +54,9 @@ class CharityAreaOfOperation(models.Model):
     class Meta:
         verbose_name = "Area of Operation"
         verbose_name_plural = "Areas of Operation"
+        indexes = [
+            models.Index(fields=["charity", "registered_charity_number"]),
+            models.Index(
+                fields=["geographic_area_type", "geographic_area_description"]
+            ),
+        ]
@@ -13,6 +13,7 @@ from django.utils.text import slugify
 from charity_django.ccni.models import (
     Charity,
     CharityClassification,
+    ClassificationTerm,
     ClassificationTypes,
 )
 
@@ -154,6 +155,30 @@ class Command(BaseCommand):
                 values,
             )
 
+    def get_classification_terms(self):
+        """
+        Get a lookup of (classification_type, classification) to term ID,
+        creating any terms that aren't already in the database
+        """
+        terms = {
+            (t.classification_type, t.classification): t.id
+            for t in ClassificationTerm.objects.all()
+        }
+        new_terms = {(c[1], c[2]) for c in self.charity_classification} - set(terms)
+        if new_terms:
+            self.logger("Creating {:,.0f} classification terms".format(len(new_terms)))
+            for t in ClassificationTerm.objects.bulk_create(
+                [
+                    ClassificationTerm(
+                        classification_type=classification_type,
+                        classification=classification,
+                    )
+                    for classification_type, classification in new_terms
+                ]
+            ):
+                terms[(t.classification_type, t.classification)] = t.id
+        return terms
+
     def save_charities(self):
         db = self._get_db()
         connection = connections[db]
@@ -181,8 +206,14 @@ class Command(BaseCommand):
                 fields = list(f.name for f in object._meta.fields if f.name != "id")
 
                 if object.__name__ == "CharityClassification":
-                    values = tuple(self.charity_classification)
-                    fields = ["charity_id", "classification_type", "classification"]
+                    terms = self.get_classification_terms()
+                    values = tuple(
+                        (charity_id, terms[(classification_type, classification)])
+                        for charity_id, classification_type, classification in (
+                            self.charity_classification
+                        )
+                    )
+                    fields = ["charity_id", "term_id"]
                 else:
                     values = tuple(
                         tuple(c.get(f) for f in fields) for c in self.charities
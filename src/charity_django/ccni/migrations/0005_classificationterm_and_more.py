@@ -0,0 +1,142 @@
+# Generated by Django 5.2.18 on 2026-10-15 21:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_terms(apps, schema_editor):
+    ClassificationTerm = apps.get_model("ccni", "ClassificationTerm")
+    CharityClassification = apps.get_model("ccni", "CharityClassification")
+    db_alias = schema_editor.connection.alias
+
+    pairs = (
+        CharityClassification.objects.using(db_alias)
+        .values_list("classification_type", "classification")
+        .distinct()
+    )
+    for classification_type, classification in pairs:
+        term = ClassificationTerm.objects.using(db_alias).create(
+            classification_type=classification_type,
+            classification=classification,
+        )
+        CharityClassification.objects.using(db_alias).filter(
+            classification_type=classification_type,
+            classification=classification,
+        ).update(term=term)
+
+
+def populate_classifications(apps, schema_editor):
+    ClassificationTerm = apps.get_model("ccni", "ClassificationTerm")
+    CharityClassification = apps.get_model("ccni", "CharityClassification")
+    db_alias = schema_editor.connection.alias
+
+    for term in ClassificationTerm.objects.using(db_alias).all():
+        CharityClassification.objects.using(db_alias).filter(term=term).update(
+            classification_type=term.classification_type,
+            classification=term.classification,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ccni", "0004_remove_charity_retained_for_future_use_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClassificationTerm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "classification_type",
+                    models.CharField(
+                        choices=[
+                            ("What the charity does", "What The Charity Does"),
+                            ("Who the charity helps", "Who The Charity Helps"),
+                            ("How the charity works", "How The Charity Works"),
+                        ],
+                        max_length=255,
+                        verbose_name="Classification type",
+                    ),
+                ),
+                (
+                    "classification",
+                    models.CharField(max_length=255, verbose_name="Classification"),
+                ),
+            ],
+            options={
+                "verbose_name": "Classification term",
+                "verbose_name_plural": "Classification terms",
+                "unique_together": {("classification_type", "classification")},
+            },
+        ),
+        # the old fields are made nullable first so that, when reversing,
+        # they can be added back and filled before the old constraints return
+        migrations.AlterField(
+            model_name="charityclassification",
+            name="classification_type",
+            field=models.CharField(
+                choices=[
+                    ("What the charity does", "What The Charity Does"),
+                    ("Who the charity helps", "Who The Charity Helps"),
+                    ("How the charity works", "How The Charity Works"),
+                ],
+                max_length=255,
+                null=True,
+                verbose_name="Classification type",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="charityclassification",
+            name="classification",
+            field=models.CharField(
+                max_length=255, null=True, verbose_name="Classification"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="charityclassification",
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name="charityclassification",
+            name="term",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="charity_classifications",
+                to="ccni.classificationterm",
+                verbose_name="Classification term",
+            ),
+        ),
+        migrations.RunPython(populate_terms, populate_classifications),
+        migrations.AlterField(
+            model_name="charityclassification",
+            name="term",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="charity_classifications",
+                to="ccni.classificationterm",
+                verbose_name="Classification term",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="charityclassification",
+            unique_together={("charity", "term")},
+        ),
+        migrations.RemoveField(
+            model_name="charityclassification",
+            name="classification",
+        ),
+        migrations.RemoveField(
+            model_name="charityclassification",
+            name="classification_type",
+        ),
+    ]
@@ -179,20 +179,20 @@ class Charity(models.Model):
     @property
     def what_the_charity_does(self):
         return self.classifications.filter(
-            classification_type=ClassificationTypes.WHAT_THE_CHARITY_DOES
-        ).values_list("classification", flat=True)
+            term__classification_type=ClassificationTypes.WHAT_THE_CHARITY_DOES
+        ).values_list("term__classification", flat=True)
 
     @property
     def who_the_charity_helps(self):
         return self.classifications.filter(
-            classification_type=ClassificationTypes.WHO_THE_CHARITY_HELPS
-        ).values_list("classification", flat=True)
+            term__classification_type=ClassificationTypes.WHO_THE_CHARITY_HELPS
+        ).values_list("term__classification", flat=True)
 
     @property
     def how_the_charity_works(self):
         return self.classifications.filter(
-            classification_type=ClassificationTypes.HOW_THE_CHARITY_WORKS
-        ).values_list("classification", flat=True)
+            term__classification_type=ClassificationTypes.HOW_THE_CHARITY_WORKS
+        ).values_list("term__classification", flat=True)
 
     @property
     def org_id(self):
@@ -206,13 +206,7 @@ class Charity(models.Model):
         verbose_name_plural = "Charities in Northern Ireland"
 
 
-class CharityClassification(models.Model):
-    charity = models.ForeignKey(
-        Charity,
-        on_delete=models.CASCADE,
-        verbose_name="Charity",
-        related_name="classifications",
-    )
+class ClassificationTerm(models.Model):
     classification_type = models.CharField(
         max_length=255,
         choices=ClassificationTypes.choices,
@@ -223,7 +217,30 @@ class CharityClassification(models.Model):
         verbose_name="Classification",
     )
 
+    def __str__(self) -> str:
+        return f"{self.classification} [{self.classification_type}]"
+
+    class Meta:
+        verbose_name = "Classification term"
+        verbose_name_plural = "Classification terms"
+        unique_together = (("classification_type", "classification"),)
+
+
+class CharityClassification(models.Model):
+    charity = models.ForeignKey(
+        Charity,
+        on_delete=models.CASCADE,
+        verbose_name="Charity",
+        related_name="classifications",
+    )
+    term = models.ForeignKey(
+        ClassificationTerm,
+        on_delete=models.CASCADE,
+        verbose_name="Classification term",
+        related_name="charity_classifications",
+    )
+
     class Meta:
         verbose_name = "Charity classification"
         verbose_name_plural = "Charity classifications"
-        unique_together = (("charity_id", "classification_type", "classification"),)
+        unique_together = (("charity", "term"),)
@@ -8,7 +8,11 @@ import requests_mock
 from django.test import TestCase
 
 from charity_django.ccni.management.commands.import_ccni import Command as CCNICommand
-from charity_django.ccni.models import Charity
+from charity_django.ccni.models import (
+    Charity,
+    CharityClassification,
+    ClassificationTerm,
+)
 
 
 class MockSession(requests.Session):
@@ -58,6 +62,21 @@ class ImportCCNITestCase(TestCase):
             charity = Charity.objects.get(reg_charity_number=100016)
             assert charity.charity_name == "Fírinne"
 
+    def test_charity_import_classifications(self):
+        command = CCNICommand()
+        command.stdout = sys.stdout
+
+        with requests_mock.Mocker() as m:
+            self._mock_csv_downloads(m)
+            command.handle()
+            command.handle()
+            assert ClassificationTerm.objects.count() == 84
+            assert CharityClassification.objects.count() == 4446
+            charity = Charity.objects.get(reg_charity_number=100016)
+            assert "The advancement of education" in charity.what_the_charity_does
+            assert "Women" in charity.who_the_charity_helps
+            assert "Community development" in charity.how_the_charity_works
+
     def test_charity_import_twice(self):
         command = CCNICommand()
         command.stdout = sys.stdout
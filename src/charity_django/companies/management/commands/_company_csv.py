@@ -0,0 +1,175 @@
+"""
+Parsing of the Companies House basic company data CSV files.
+
+Nothing in this module touches the database, so the functions can be run
+in worker processes by the import_companies command.
+"""
+
+import csv
+import datetime
+import io
+import zipfile
+
+from charity_django.companies.ch_api import (
+    ACCOUNTS_TYPE_LOOKUP,
+    COMPANY_CATEGORY_LOOKUP,
+    COMPANY_STATUS_LOOKUP,
+    AccountTypes,
+    CompanyStatuses,
+    CompanyTypes,
+)
+
+DEFAULT_DATE_FORMAT = "%Y-%m-%d"
+DMY_DATE_FORMAT = "%d/%m/%Y"
+TRUE_VALUES = frozenset({"t", "true", "yes", "1", "y"})
+FALSE_VALUES = frozenset({"f", "false", "no", "0", "n"})
+CATEGORIES = (
+    ("CompanyCategory", COMPANY_CATEGORY_LOOKUP, CompanyTypes),
+    ("CompanyStatus", COMPANY_STATUS_LOOKUP, CompanyStatuses),
+    ("Accounts_AccountCategory", ACCOUNTS_TYPE_LOOKUP, AccountTypes),
+)
+
+_strptime = datetime.datetime.strptime
+
+
+def clean_date(value, date_format=DEFAULT_DATE_FORMAT):
+    try:
+        return _strptime(value.strip(), date_format).date()
+    except ValueError:
+        return None
+
+
+def clean_ddmmyyyy(value):
+    """
+    Parse a date in dd/mm/yyyy format
+
+    Slicing the string is much quicker than strptime, which is only used
+    for values that aren't in exactly this format.
+    """
+    value = value.strip()
+    if len(value) == 10 and value[2] == "/" and value[5] == "/":
+        try:
+            return datetime.date(int(value[6:10]), int(value[3:5]), int(value[0:2]))
+        except ValueError:
+            pass
+    return clean_date(value, DMY_DATE_FORMAT)
+
+
+def clean_bool(value):
+    val = value.lower().strip()
+    if val in FALSE_VALUES:
+        return False
+    if val in TRUE_VALUES:
+        return True
+    return value
+
+
+def clean_string(value):
+    # the file is read as latin-1, so non-ASCII text needs to be decoded
+    # again as UTF-8
+    if not value.isascii():
+        value = value.encode("latin-1").decode("utf8")
+    return value.strip().replace("\x00", "")
+
+
+def clean_fields(record, field_actions):
+    for f, value in record.items():
+        # blank values become None, otherwise use the field's cleaner
+        if value:
+            record[f] = field_actions.get(f, clean_string)(value)
+        else:
+            record[f] = None
+    return record
+
+
+def clean_categories(row):
+    for field, lookup, enum in CATEGORIES:
+        row[field] = lookup.get(row.get(field), row.get(field))
+        if isinstance(row[field], enum):
+            row[field] = row[field].value
+        elif row[field] is None:
+            row[field] = None
+        else:
+            raise ValueError("Unknown {} value: {}".format(field, row[field]))
+    return row
+
+
+def parse_row(row, field_actions):
+    """
+    Turn a row from the CSV into a company record.
+
+    Returns a tuple of the company record, a list of previous names and a
+    list of (code, title) tuples for the SIC codes.
+    """
+    row = clean_fields(row, field_actions)
+    row = clean_categories(row)
+
+    previous_names = {}
+    sic_codes = []
+    company = {}
+    for k in row:
+        if k.startswith("PreviousName_"):
+            pn = k.split("_")
+            if row[k] and row[k] != "":
+                if pn[1] not in previous_names:
+                    previous_names[pn[1]] = {}
+
+                if pn[2] == "CONDATE":
+                    previous_names[pn[1]][pn[2]] = clean_ddmmyyyy(row[k])
+                    previous_names[pn[1]]["nameno"] = pn[1]
+                else:
+                    previous_names[pn[1]][pn[2]] = row[k]
+
+        elif k.startswith("SICCode_"):
+            if row[k] and row[k].replace("None Supplied", "") != "":
+                sic_code, sic_title = (
+                    v.strip() for v in row[k].split(" - ", maxsplit=1)
+                )
+                sic_codes.append((sic_code, sic_title))
+        elif k == "URI":
+            continue
+        else:
+            company[k] = row[k]
+
+    return company, list(previous_names.values()), sic_codes
+
+
+def read_csv(path, member):
+    """
+    Read the rows of a CSV file within a zip file
+
+    The file is UTF-8, but decoding it as latin-1 is quicker. Almost all of
+    the values are ASCII, which is the same in both, and clean_string
+    decodes any other values properly.
+    """
+    with zipfile.ZipFile(path) as z, z.open(member) as csvfile:
+        reader = csv.DictReader(
+            io.TextIOWrapper(csvfile, encoding="latin-1", newline="")
+        )
+        # normalise the column names once per file rather than per row. An
+        # empty file has no header, and so no rows
+        if reader.fieldnames:
+            reader.fieldnames = [k.strip().replace(".", "_") for k in reader.fieldnames]
+        yield from reader
+
+
+def parse_csv(path, member, field_actions, queue, batch_size=10_000):
+    """
+    Parse a CSV file within a zip file, putting lists of parsed rows on the
+    queue. None is put on the queue once the file is finished.
+    """
+    count = 0
+    batch = []
+    try:
+        for row in read_csv(path, member):
+            batch.append(parse_row(row, field_actions))
+            if len(batch) >= batch_size:
+                queue.put(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            queue.put(batch)
+            count += len(batch)
+    finally:
+        queue.put(None)
+    return count
@@ -2,39 +2,48 @@ import argparse
 import csv
 import datetime
 import io
+import multiprocessing
+import os
 import random
 import re
+import tempfile
 import zipfile
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from operator import itemgetter
+from queue import Empty
+from urllib.parse import urljoin
 
 import requests
 import tqdm
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import connections, router, transaction
-from requests_html import HTMLSession
-
-from charity_django.companies.ch_api import (
-    ACCOUNTS_TYPE_LOOKUP,
-    COMPANY_CATEGORY_LOOKUP,
-    COMPANY_STATUS_LOOKUP,
-    AccountTypes,
-    CompanyStatuses,
-    CompanyTypes,
-)
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
+from urllib3.util.retry import Retry
+
 from charity_django.companies.models import (
     Company,
     CompanySICCode,
     PreviousName,
     SICCode,
 )
-from charity_django.utils.cachedsession import CachedHTMLSession
 
+from ._company_csv import (
+    DEFAULT_DATE_FORMAT,
+    DMY_DATE_FORMAT,
+    clean_bool,
+    clean_date,
+    clean_ddmmyyyy,
+    parse_csv,
+    parse_row,
+    read_csv,
+)
 from ._company_sql import UPDATE_COMPANIES
 
-DEFAULT_DATE_FORMAT = "%Y-%m-%d"
-
-
 MODEL_UPDATES = {
     Company: {
         "update_conflicts": True,
@@ -44,28 +53,44 @@ MODEL_UPDATES = {
             if f.name not in ["CompanyNumber"] and hasattr(f, "get_attname_column")
         ],
         "unique_fields": ["CompanyNumber"],
+        "batch_size": 1000,
     },
     PreviousName: {
         "update_conflicts": True,
         "update_fields": [
+            "last_updated",
             "in_latest_update",
         ],
         "unique_fields": ["company", "CompanyName"],
+        "batch_size": 1000,
     },
     CompanySICCode: {
         "update_conflicts": True,
         "update_fields": [
+            "last_updated",
             "in_latest_update",
         ],
         "unique_fields": ["company", "sic_code"],
+        "batch_size": 1000,
     },
 }
 
+# get the key that identifies a record dict within its buffer, matching
+# the primary key or unique_together fields of the model
+UNIQUE_KEYS = {
+    Company: itemgetter("CompanyNumber"),
+    PreviousName: itemgetter("company_id", "CompanyName"),
+    CompanySICCode: itemgetter("company_id", "sic_code_id"),
+}
+
+# marker for NULL values in the CSV loaded by copy_companies
+COPY_NULL = r"\N"
+
 
 class Command(BaseCommand):
     name = "companies"
     start_url = "http://download.companieshouse.gov.uk/en_output.html"
-    zip_regex = re.compile(r".*/BasicCompanyData-.*\.zip")
+    zip_regex = re.compile(r'href="([^"]*BasicCompanyData-[^"]*\.zip)"')
     id_field = "CompanyNumber"
     date_fields = [
         "DissolutionDate",
@@ -77,8 +102,13 @@ class Command(BaseCommand):
         "ConfStmtNextDueDate",
         "ConfStmtLastMadeUpDate",
     ]
-    date_format = "%d/%m/%Y"
+    date_format = DMY_DATE_FORMAT
     bulk_limit = 50000
+    delete_limit = 10_000
+    workers = 1
+    download_workers = 4
+    parse_batch_size = 10_000
+    queue_timeout = 1
     source = {
         "title": "Free Company Data Product",
         "description": "The Free Company Data Product is a downloadable data snapshot \
@@ -102,8 +132,10 @@ class Command(BaseCommand):
         super().__init__(*args, **kwargs)
         self.records = defaultdict(dict)
         self.object_count = defaultdict(lambda: 0)
-        self.now = datetime.datetime.now()
+        self.now = timezone.now()
         self.sic_code_cache = {}
+        self._pending_sic_codes = {}
+        self._field_actions = self.get_field_actions()
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -119,317 +151,343 @@ class Command(BaseCommand):
             default=settings.DEBUG,
         )
         parser.add_argument("--sample", type=int, default=0)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of processes used to parse the CSV files",
+            default=min(8, os.cpu_count() or 1),
+        )
 
     def handle(self, *args, **options):
         self.debug = options["debug"]
         self.sample = options["sample"]
+        self.workers = options.get("workers", 1)
         db = router.db_for_write(Company)
+        self.sic_code_cache = dict(SICCode.objects.values_list("code", "title"))
         with transaction.atomic(using=db), connections[db].cursor() as cursor:
-            new_tables = []
-
-            for m in MODEL_UPDATES.keys():
-                # name the temporary table
-                new_table = m._meta.db_table + "_temp"
-
-                # the columns should be the same as the existing table
-                # except for the new in_latest_update column
-                columns = [
-                    f.get_attname_column()[1]
-                    for f in m._meta.get_fields()
-                    if hasattr(f, "get_attname_column")
-                    and f.get_attname_column()[1] != "in_latest_update"
-                ]
-                new_tables.append((new_table, m._meta.db_table, columns))
-                columns = ", ".join([f'"{c}"' for c in columns])
-
-                # make a copy of the existing table
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Copying {m.__name__} to temporary table - started"
-                    )
-                )
-                cursor.execute(
-                    f'''
-                    CREATE TABLE "{new_table}" AS
-                    SELECT {columns}, false as "in_latest_update"
-                    FROM "{m._meta.db_table}"'''
-                )
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Copying {m.__name__} to temporary table - finished"
-                    )
-                )
-
-                # truncate the existing table
-                self.stdout.write(
-                    self.style.SUCCESS(f"Truncating {m.__name__} db table - started")
-                )
-                cursor.execute(f'DELETE FROM "{m._meta.db_table}" WHERE 1=1')
-                self.stdout.write(
-                    self.style.SUCCESS(f"Truncating {m.__name__} db table - finished")
-                )
-
             # import the new data
             self.set_session(install_cache=options["cache"])
             self.fetch_file()
 
-            # copy in old data that doesn't exist in the new data
-            # delete the temporary tables
-            for temp_table, main_table, columns in new_tables:
-                a_columns = ", ".join(
-                    [f'a."{c}"' for c in columns if c != "id"]
-                    + ['"a"."in_latest_update"']
-                )
-                columns = ", ".join(
-                    [f'"{c}"' for c in columns if c != "id"] + ['"in_latest_update"']
-                )
-                update_query = f"""
-                INSERT INTO "{main_table}" ({columns})
-                SELECT DISTINCT {a_columns}
-                FROM "{temp_table}" a
-                    LEFT OUTER JOIN "{main_table}" b
-                        ON a."CompanyNumber" = b."CompanyNumber"
-                WHERE b."CompanyNumber" IS NULL
-                """
+            # records saved by this import have last_updated >= self.now.
+            # Remove previous names and SIC codes that are no longer listed
+            # for companies in this update
+            for m in (PreviousName, CompanySICCode):
                 self.stdout.write(
-                    self.style.SUCCESS(f"Updating {main_table} db table - started")
+                    self.style.SUCCESS(f"Removing old {m.__name__} records - started")
                 )
-                cursor.execute(update_query)
+                self.delete_old_records(cursor, m)
                 self.stdout.write(
-                    self.style.SUCCESS(f"Updating {main_table} db table - finished")
+                    self.style.SUCCESS(f"Removing old {m.__name__} records - finished")
                 )
+
+            # other records that weren't in this update are kept, but marked
+            # as not being in the latest update
+            for m in MODEL_UPDATES.keys():
                 self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Dropping {temp_table} temporary table - started"
-                    )
+                    self.style.SUCCESS(f"Updating {m.__name__} db table - started")
                 )
-                cursor.execute(f'DROP TABLE "{temp_table}"')
+                m.objects.filter(
+                    last_updated__lt=self.now, in_latest_update=True
+                ).update(in_latest_update=False)
                 self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Dropping {temp_table} temporary table - finished"
-                    )
+                    self.style.SUCCESS(f"Updating {m.__name__} db table - finished")
                 )
 
             for title, sql in UPDATE_COMPANIES.items():
                 cursor.execute(sql)
                 self.stdout.write(self.style.SUCCESS(f"Executed {title}"))
 
+    def delete_old_records(self, cursor, model):
+        """
+        Delete records that weren't in this update for companies that were
+
+        Records are deleted in batches of delete_limit so that each DELETE
+        statement stays small, however large the table is.
+        """
+        table = model._meta.db_table
+        pk = model._meta.pk.column
+        company_column = model._meta.get_field("company").column
+        company_table = Company._meta.db_table
+        company_pk = Company._meta.pk.column
+        while True:
+            cursor.execute(
+                f'''
+                DELETE FROM "{table}"
+                WHERE "{pk}" IN (
+                    SELECT a."{pk}"
+                    FROM "{table}" a
+                        INNER JOIN "{company_table}" b
+                            ON a."{company_column}" = b."{company_pk}"
+                    WHERE a."last_updated" < %(now)s
+                        AND b."last_updated" >= %(now)s
+                    LIMIT %(limit)s
+                )''',
+                {"now": self.now, "limit": self.delete_limit},
+            )
+            if cursor.rowcount < self.delete_limit:
+                break
+
     def set_session(self, install_cache=False):
         if install_cache:
             self.stdout.write("Using requests_cache")
-            self.session = CachedHTMLSession(
+            self.session = CachedSession(
                 cache_name="companies_house_download_cache",
                 cache_control=False,
                 expire_after=datetime.timedelta(days=10),
             )
         else:
-            self.session = HTMLSession()
+            self.session = requests.Session()
+
+        # keep connections open between the downloads and retry failures
+        adapter = HTTPAdapter(
+            pool_connections=self.download_workers,
+            pool_maxsize=self.download_workers,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=1,
+                status_forcelist=[429, 500, 502, 503, 504],
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
     def fetch_file(self):
         self.files = {}
         response = self.session.get(self.start_url)
         response.raise_for_status()
-        for link in sorted(response.html.absolute_links):
-            if self.zip_regex.match(link):
-                self.stdout.write("Fetching: {}".format(link))
+        links = {
+            urljoin(self.start_url, href)
+            for href in self.zip_regex.findall(response.text)
+        }
+        links = sorted(links)
+        if getattr(self, "sample", None):
+            links = links[:1]
+
+        futures = {}
+        try:
+            # download the files in parallel, keeping them in link order
+            with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+                for link in links:
+                    self.stdout.write("Fetching: {}".format(link))
+                    futures[link] = executor.submit(self.download_file, link)
+                for link, future in futures.items():
+                    try:
+                        self.files[link] = future.result()
+                    except requests.exceptions.ChunkedEncodingError as err:
+                        self.stdout.write(
+                            self.style.ERROR("Error fetching: {}".format(link))
+                        )
+                        self.stdout.write(self.style.ERROR(str(err)))
+
+            if (
+                self.workers > 1
+                and not self.debug
+                and not getattr(self, "sample", None)
+            ):
+                self.parse_files_parallel(self.files)
+            else:
+                for link, path in self.files.items():
+                    self.parse_file(path, link)
+        finally:
+            # the executor has waited for every download by now, so remove
+            # all the files that were downloaded, including any that weren't
+            # collected because an earlier download failed
+            for future in futures.values():
+                if not future.cancelled() and future.exception() is None:
+                    os.remove(future.result())
+
+    def download_file(self, link):
+        """Stream a zip file to a temporary file on disk and return its path"""
+        with self.session.get(link, stream=True) as response:
+            if getattr(response, "from_cache", False):
+                self.stdout.write("From cache: {}".format(link))
+            else:
+                self.stdout.write("From network: {}".format(link))
+            response.raise_for_status()
+            with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
                 try:
-                    file_response = self.session.get(link)
-                    if getattr(file_response, "from_cache", False):
-                        self.stdout.write("From cache")
-                    else:
-                        self.stdout.write("From network")
-                    file_response.raise_for_status()
-                    self.parse_file(file_response, link)
-                except requests.exceptions.ChunkedEncodingError as err:
-                    self.stdout.write(
-                        self.style.ERROR("Error fetching: {}".format(link))
-                    )
-                    self.stdout.write(self.style.ERROR(str(err)))
-                if getattr(self, "sample", None):
-                    break
-
-    def parse_file(self, response, source_url):
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+                except Exception:
+                    f.close()
+                    os.remove(f.name)
+                    raise
+        return f.name
+
+    def parse_file(self, path, source_url):
         self.stdout.write("Opening: {}".format(source_url))
         chance_of_selection = 1
         selected_count = 0
         if getattr(self, "sample", None):
             chance_of_selection = self.sample / 750_000
             print(f"Chance of selection: {chance_of_selection}")
-        with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-            for f in z.infolist():
-                self.stdout.write("Opening: {}".format(f.filename))
-                with z.open(f) as csvfile:
-                    reader = csv.DictReader(io.TextIOWrapper(csvfile, encoding="utf8"))
-                    for index, row in tqdm.tqdm(enumerate(reader)):
-                        if getattr(self, "sample", None):
-                            if (random.random() > chance_of_selection) or (
-                                selected_count >= self.sample
-                            ):
-                                continue
-                            selected_count += 1
-                        self.parse_row(row)
-                        if (
-                            self.debug
-                            and (index >= 100)
-                            and not getattr(self, "sample", None)
-                        ):
-                            break
-                    self.save_all_records()
-        response = None
+        with zipfile.ZipFile(path) as z:
+            members = z.namelist()
+        for member in members:
+            self.stdout.write("Opening: {}".format(member))
+            for index, row in tqdm.tqdm(enumerate(read_csv(path, member))):
+                if getattr(self, "sample", None):
+                    if (random.random() > chance_of_selection) or (
+                        selected_count >= self.sample
+                    ):
+                        continue
+                    selected_count += 1
+                self.parse_row(row)
+                if self.debug and (index >= 100) and not getattr(self, "sample", None):
+                    break
+            self.save_all_records()
 
-    def parse_row(self, row):
-        row = {k.strip().replace(".", "_"): row[k] for k in row}
-        row = self.clean_fields(row)
-        row = self.clean_categories(row)
-
-        previous_names = {}
-        sic_codes = []
-        record = {}
-        for k in row:
-            if k.startswith("PreviousName_"):
-                pn = k.split("_")
-                if row[k] and row[k] != "":
-                    if pn[1] not in previous_names:
-                        previous_names[pn[1]] = {}
-
-                    if pn[2] == "CONDATE":
-                        previous_names[pn[1]][pn[2]] = datetime.datetime.strptime(
-                            row[k], "%d/%m/%Y"
-                        ).date()
-                        previous_names[pn[1]]["nameno"] = pn[1]
-                    else:
-                        previous_names[pn[1]][pn[2]] = row[k]
-
-            elif k.startswith("SICCode_"):
-                if row[k] and row[k].replace("None Supplied", "") != "":
-                    sic_code, sic_title = (
-                        v.strip() for v in row[k].split(" - ", maxsplit=1)
-                    )
-                    if sic_code not in self.sic_code_cache:
-                        new_code, _ = SICCode.objects.update_or_create(
-                            code=sic_code, defaults={"title": sic_title}
-                        )
-                        self.sic_code_cache[sic_code] = new_code
-                    sic_codes.append(self.sic_code_cache[sic_code])
-            elif k == "URI":
-                continue
-            else:
-                record[k] = row[k]
-
-        record["previous_names"] = list(previous_names.values())
-        record["sic_codes"] = sic_codes
-
-        address1 = []
-        for f in [
-            "RegAddress_CareOf",
-            "RegAddress_POBox",
-            "RegAddress_AddressLine1",
-            "RegAddress_AddressLine2",
-        ]:
-            if record.get(f):
-                address1.append(record.get(f))
-
-        company = Company(
-            **{
-                k: v
-                for k, v in record.items()
-                if k not in ("sic_codes", "previous_names")
-            },
-            last_updated=self.now,
-            in_latest_update=True,
+    def parse_files_parallel(self, files):
+        """
+        Parse the CSV files in worker processes
+
+        Each CSV file within the zip files is parsed by a separate worker,
+        which sends batches of parsed rows back through a queue. The records
+        are saved to the database by this process.
+        """
+        tasks = []
+        for path in files.values():
+            with zipfile.ZipFile(path) as z:
+                tasks.extend((path, member) for member in z.namelist())
+        if not tasks:
+            return
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context("forkserver")
+        else:
+            mp_context = multiprocessing.get_context("spawn")
+        max_workers = min(self.workers, len(tasks))
+        self.stdout.write(
+            "Parsing {:,.0f} files using {:,.0f} workers".format(
+                len(tasks), max_workers
+            )
         )
+        with mp_context.Manager() as manager:
+            queue = manager.Queue(maxsize=max_workers * 2)
+            with ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=mp_context
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        parse_csv,
+                        path,
+                        member,
+                        self._field_actions,
+                        queue,
+                        batch_size=self.parse_batch_size,
+                    )
+                    for path, member in tasks
+                ]
+                try:
+                    self.read_batches(queue, futures)
+                    # raise any errors from the workers
+                    for future in futures:
+                        future.result()
+                except Exception:
+                    # stop any files that haven't started yet, and keep
+                    # emptying the queue so that workers blocked on it can
+                    # finish before the executor waits for them
+                    for future in futures:
+                        future.cancel()
+                    self.drain_queue(queue, futures)
+                    raise
+        self.save_all_records()
+
+    def read_batches(self, queue, futures):
+        """Add the parsed rows from the queue until every file is finished"""
+        remaining = len(futures)
+        with tqdm.tqdm() as progress:
+            while remaining:
+                try:
+                    batch = queue.get(timeout=self.queue_timeout)
+                except Empty:
+                    # a worker that dies (eg when out of memory) never sends
+                    # its end of file marker, so check for failed workers
+                    for future in futures:
+                        if future.done() and future.exception() is not None:
+                            future.result()
+                    continue
+                if batch is None:
+                    remaining -= 1
+                    continue
+                for company, previous_names, sic_codes in batch:
+                    self.add_company(company, previous_names, sic_codes)
+                progress.update(len(batch))
+
+    def drain_queue(self, queue, futures):
+        """Discard batches from the queue until every worker has finished"""
+        while not all(future.done() for future in futures):
+            try:
+                queue.get(timeout=self.queue_timeout)
+            except Empty:
+                pass
 
+    def parse_row(self, row):
+        self.add_company(*parse_row(row, self._field_actions))
+
+    def add_company(self, company, previous_names, sic_codes):
+        company["last_updated"] = self.now
+        company["in_latest_update"] = True
         self.add_record(Company, company)
-        for n in record["previous_names"]:
+
+        company_number = company["CompanyNumber"]
+        for n in previous_names:
             self.add_record(
                 PreviousName,
                 {
-                    "company": company,
+                    "company_id": company_number,
                     "CompanyName": n["CompanyName"],
                     "ConDate": n["CONDATE"],
                     "in_latest_update": True,
                 },
             )
-        for s in record["sic_codes"]:
+        # SIC codes are checked against the cache when the batch is saved
+        self._pending_sic_codes.update(sic_codes)
+        for sic_code, sic_title in sic_codes:
             self.add_record(
                 CompanySICCode,
                 {
-                    "company": company,
-                    "sic_code": s,
+                    "company_id": company_number,
+                    "sic_code_id": sic_code,
                     "in_latest_update": True,
                 },
             )
 
-    def clean_fields(self, record):
-        for f in record.keys():
-            # clean blank values
-            if record[f] == "":
-                record[f] = None
-
-            # clean date fields
-            elif f in getattr(self, "date_fields", []) and isinstance(record[f], str):
-                date_format = self.date_format
-                if isinstance(date_format, dict):
-                    date_format = date_format.get(f, DEFAULT_DATE_FORMAT)
-
-                try:
-                    if record.get(f):
-                        record[f] = datetime.datetime.strptime(
-                            record.get(f).strip(), date_format
-                        )
-                except ValueError:
-                    record[f] = None
-
-            # clean boolean fields
-            elif f in getattr(self, "bool_fields", []):
-                if isinstance(record[f], str):
-                    val = record[f].lower().strip()
-                    if val in ["f", "false", "no", "0", "n"]:
-                        record[f] = False
-                    elif val in ["t", "true", "yes", "1", "y"]:
-                        record[f] = True
-
-            # strip string fields
-            elif isinstance(record[f], str):
-                record[f] = record[f].strip().replace("\x00", "")
-        return record
-
-    def clean_categories(self, row):
-        cats = [
-            ("CompanyCategory", COMPANY_CATEGORY_LOOKUP, CompanyTypes),
-            ("CompanyStatus", COMPANY_STATUS_LOOKUP, CompanyStatuses),
-            ("Accounts_AccountCategory", ACCOUNTS_TYPE_LOOKUP, AccountTypes),
-        ]
-        for field, lookup, enum in cats:
-            row[field] = lookup.get(row.get(field), row.get(field))
-            if isinstance(row[field], enum):
-                row[field] = row[field].value
-            elif row[field] is None:
-                row[field] = None
+    def get_field_actions(self):
+        """Map each date and boolean field to the function used to clean it"""
+        field_actions = {}
+        for f in getattr(self, "date_fields", []):
+            date_format = self.date_format
+            if isinstance(date_format, dict):
+                date_format = date_format.get(f, DEFAULT_DATE_FORMAT)
+            if date_format == DMY_DATE_FORMAT:
+                field_actions[f] = clean_ddmmyyyy
             else:
-                raise ValueError("Unknown {} value: {}".format(field, row[field]))
-        return row
+                field_actions[f] = partial(clean_date, date_format=date_format)
+        for f in getattr(self, "bool_fields", []):
+            field_actions[f] = clean_bool
+        return field_actions
 
     def add_record(self, model, record):
-        if isinstance(record, dict):
-            record = model(**record)
-        if model._meta.unique_together:
-            unique_fields = tuple(
-                getattr(record, f) for f in model._meta.unique_together[0]
-            )
-        else:
-            unique_fields = (record.pk,)
-        self.records[model][unique_fields] = record
-        if len(self.records[Company]) >= self.bulk_limit:
+        # records are kept as dicts of attnames until they are saved
+        records = self.records[model]
+        records[UNIQUE_KEYS[model](record)] = record
+        if len(records) >= self.bulk_limit:
             self.save_all_records()
 
     def save_records(self, model):
         self.stdout.write(
             "Saving {:,.0f} {} records".format(len(self.records[model]), model.__name__)
         )
-        model.objects.bulk_create(
-            self.records[model].values(), **MODEL_UPDATES.get(model, {})
-        )
+        db = router.db_for_write(model)
+        if model is Company and connections[db].vendor == "postgresql":
+            self.copy_companies(self.records[model].values(), db)
+        else:
+            model.objects.bulk_create(
+                [model(**record) for record in self.records[model].values()],
+                **MODEL_UPDATES.get(model, {}),
+            )
         self.object_count[model] += len(self.records[model])
         self.stdout.write(
             "Saved {:,.0f} {} records ({:,.0f} total)".format(
@@ -440,7 +498,94 @@ class Command(BaseCommand):
         )
         self.records[model] = {}
 
+    def copy_companies(self, records, db):
+        """
+        Load company records using PostgreSQL's COPY
+
+        The records are copied into a temporary staging table. Companies
+        that already exist are then updated from the staging table in one
+        statement, and the remaining companies inserted in another.
+        """
+        table = Company._meta.db_table
+        staging_table = f"{table}_staging"
+        fields = Company._meta.concrete_fields
+        columns = ", ".join(f'"{f.column}"' for f in fields)
+        update_columns = ", ".join(
+            f'"{c}" = s."{c}"'
+            for c in (
+                Company._meta.get_field(f).column
+                for f in MODEL_UPDATES[Company]["update_fields"]
+            )
+        )
+        join_condition = " AND ".join(
+            f'c."{c}" = s."{c}"'
+            for c in (
+                Company._meta.get_field(f).column
+                for f in MODEL_UPDATES[Company]["unique_fields"]
+            )
+        )
+
+        # None is written as an explicit NULL marker, so that empty strings
+        # are kept as empty strings rather than read as NULL
+        data = io.StringIO()
+        writer = csv.writer(data)
+        for record in records:
+            writer.writerow(
+                [
+                    COPY_NULL if value is None else value
+                    for value in (record.get(f.attname) for f in fields)
+                ]
+            )
+        data.seek(0)
+
+        with transaction.atomic(using=db), connections[db].cursor() as cursor:
+            cursor.execute(
+                f'''
+                CREATE TEMPORARY TABLE IF NOT EXISTS "{staging_table}"
+                (LIKE "{table}" INCLUDING DEFAULTS)
+                ON COMMIT DROP'''
+            )
+            cursor.execute(f'TRUNCATE "{staging_table}"')
+            cursor.copy_expert(
+                f'COPY "{staging_table}" ({columns}) FROM STDIN '
+                f"WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                data,
+            )
+            cursor.execute(
+                f'''
+                UPDATE "{table}" AS c
+                SET {update_columns}
+                FROM "{staging_table}" AS s
+                WHERE {join_condition}'''
+            )
+            cursor.execute(
+                f'''
+                INSERT INTO "{table}" ({columns})
+                SELECT {columns}
+                FROM "{staging_table}" AS s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM "{table}" AS c WHERE {join_condition}
+                )'''
+            )
+
+    def save_sic_codes(self):
+        # only save codes that are new or have a different title
+        new_sic_codes = dict(
+            self._pending_sic_codes.items() - self.sic_code_cache.items()
+        )
+        if new_sic_codes:
+            SICCode.objects.bulk_create(
+                [SICCode(code=c, title=t) for c, t in new_sic_codes.items()],
+                update_conflicts=True,
+                update_fields=["title"],
+                unique_fields=["code"],
+            )
+            self.sic_code_cache.update(new_sic_codes)
+        self._pending_sic_codes = {}
+
     def save_all_records(self):
+        if self._pending_sic_codes:
+            self.save_sic_codes()
         for model, records in self.records.items():
             if len(records):
                 self.save_records(model)
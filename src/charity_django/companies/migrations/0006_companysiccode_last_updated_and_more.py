@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-15 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("companies", "0005_alter_account_category_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="companysiccode",
+            name="last_updated",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name="previousname",
+            name="last_updated",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="company",
+            name="last_updated",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
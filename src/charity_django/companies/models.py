@@ -369,7 +369,7 @@ class Company(models.Model):
     ConfStmtLastMadeUpDate = models.DateField(
         null=True, blank=True, verbose_name="Confirmation statement last made up"
     )
-    last_updated = models.DateTimeField(auto_now=True)
+    last_updated = models.DateTimeField(auto_now=True, db_index=True)
     in_latest_update = models.BooleanField(default=False, db_index=True)
 
     @property
@@ -414,6 +414,7 @@ class CompanySICCode(models.Model):
         db_column="code",
         db_constraint=False,
     )
+    last_updated = models.DateTimeField(auto_now=True, db_index=True)
     in_latest_update = models.BooleanField(default=False, db_index=True)
 
     objects = CompanyManager()
@@ -432,6 +433,7 @@ class PreviousName(models.Model):
     )
     ConDate = models.DateField(null=True, blank=True)
     CompanyName = models.CharField(max_length=255)
+    last_updated = models.DateTimeField(auto_now=True, db_index=True)
     in_latest_update = models.BooleanField(default=False, db_index=True)
     objects = CompanyManager()
 
@@ -1,13 +1,24 @@
+import datetime
 import os
 import re
+import tempfile
+import zipfile
 from unittest.mock import patch
 
+import requests
 import requests_mock
+from django.db import connections
 from django.test import TestCase
-from requests_html import HTMLSession
+from requests import Session
 
+from charity_django.companies.management.commands._company_csv import read_csv
 from charity_django.companies.management.commands.import_companies import Command
-from charity_django.companies.models import Company
+from charity_django.companies.models import (
+    Company,
+    CompanySICCode,
+    PreviousName,
+    SICCode,
+)
 
 
 class TestImportCompanies(TestCase):
@@ -29,7 +40,7 @@ class TestImportCompanies(TestCase):
         assert hasattr(command, "session") is False
         command.set_session()
         assert hasattr(command, "session") is True
-        assert isinstance(command.session, HTMLSession)
+        assert isinstance(command.session, Session)
 
     def test_fetch_file(self):
         command = Command()
@@ -39,6 +50,52 @@ class TestImportCompanies(TestCase):
             command.set_session()
             command.fetch_file()
             assert Company.objects.count() == 87
+            assert SICCode.objects.count() == 31
+            assert CompanySICCode.objects.count() == 44
+            assert (
+                Company.objects.get(CompanyNumber="12623053").CompanyName
+                == "WE ARE RISQUÉ LTD"
+            )
+
+    def test_fetch_file_bulk_create(self):
+        # on PostgreSQL companies are saved with COPY, so check the
+        # bulk_create path used by other databases too
+        command = Command()
+
+        with requests_mock.Mocker() as m:
+            self.mock_csv_downloads(m)
+            with patch.object(connections["default"], "vendor", "sqlite"):
+                command.set_session()
+                command.fetch_file()
+            assert Company.objects.count() == 87
+            assert (
+                Company.objects.get(CompanyNumber="12623053").CompanyName
+                == "WE ARE RISQUÉ LTD"
+            )
+
+    def test_fetch_file_download_error(self):
+        # the other files are still downloaded when one of them fails, and
+        # they should all be removed
+        command = Command()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with requests_mock.Mocker() as m, patch("tempfile.tempdir", tmpdir):
+                self.mock_csv_downloads(m)
+                m.get(
+                    "http://download.companieshouse.gov.uk/BasicCompanyData-2020-06-01-part1_6.zip",
+                    status_code=404,
+                )
+                command.set_session()
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    command.fetch_file()
+            assert os.listdir(tmpdir) == []
+
+    def test_read_csv_empty(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "empty.zip")
+            with zipfile.ZipFile(path, "w") as z:
+                z.writestr("a.csv", "")
+            assert list(read_csv(path, "a.csv")) == []
 
     def test_handle(self):
         command = Command()
@@ -48,6 +105,97 @@ class TestImportCompanies(TestCase):
             command.handle(debug=False, cache=False, sample=0)
             assert Company.objects.count() == 87
 
+    def test_handle_existing(self):
+        old_company = Company.objects.create(
+            CompanyNumber="ZZ000001",
+            CompanyName="OLD COMPANY LTD",
+            CompanyStatus="active",
+            in_latest_update=True,
+        )
+        PreviousName.objects.create(
+            company=old_company, CompanyName="OLDER COMPANY LTD", in_latest_update=True
+        )
+        current_company = Company.objects.create(
+            CompanyNumber="00169392",
+            CompanyName="UK LEATHER FEDERATION",
+            in_latest_update=True,
+        )
+        PreviousName.objects.create(
+            company=current_company,
+            CompanyName="NOT A PREVIOUS NAME",
+            in_latest_update=True,
+        )
+        last_updated = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        Company.objects.update(last_updated=last_updated)
+        PreviousName.objects.update(last_updated=last_updated)
+
+        command = Command()
+
+        with requests_mock.Mocker() as m:
+            self.mock_csv_downloads(m)
+            command.handle(debug=False, cache=False, sample=0)
+            assert Company.objects.count() == 88
+
+            old_company.refresh_from_db()
+            assert old_company.in_latest_update is False
+            assert old_company.CompanyStatus == "removed"
+            assert old_company.previous_names.get().in_latest_update is False
+
+            current_company.refresh_from_db()
+            assert current_company.in_latest_update is True
+            assert not current_company.previous_names.filter(
+                CompanyName="NOT A PREVIOUS NAME"
+            ).exists()
+
+    def test_save_records_blank_values(self):
+        # on PostgreSQL companies are saved with COPY, which must keep
+        # empty strings distinct from NULL
+        command = Command()
+        command.add_record(
+            Company,
+            {
+                "CompanyNumber": "ZZ000002",
+                "CompanyName": "",
+                "RegAddress_CareOf": "",
+                "RegAddress_PostTown": None,
+                "IncorporationDate": None,
+                "last_updated": command.now,
+                "in_latest_update": True,
+            },
+        )
+        command.save_all_records()
+
+        company = Company.objects.get(CompanyNumber="ZZ000002")
+        assert company.CompanyName == ""
+        assert company.RegAddress_CareOf == ""
+        assert company.RegAddress_PostTown is None
+        assert company.IncorporationDate is None
+        assert company.in_latest_update is True
+
+    def test_handle_workers(self):
+        command = Command()
+
+        with requests_mock.Mocker() as m:
+            self.mock_csv_downloads(m)
+            command.handle(debug=False, cache=False, sample=0, workers=2)
+            assert Company.objects.count() == 87
+            assert CompanySICCode.objects.count() == 44
+
+    def test_handle_workers_error(self):
+        # small batches fill the queue, so a worker is left waiting to add
+        # to it when saving the records fails
+        command = Command()
+        command.parse_batch_size = 5
+
+        with requests_mock.Mocker() as m:
+            self.mock_csv_downloads(m)
+            with patch.object(
+                Command, "add_company", side_effect=ValueError("Save failed")
+            ):
+                with self.assertRaisesMessage(ValueError, "Save failed"):
+                    command.handle(debug=False, cache=False, sample=0, workers=2)
+        assert Company.objects.count() == 0
+
     @patch("random.random", side_effect=[0.01, 0.99] * 1_000)
     def test_handle_sample(self, random_mock):
         command = Command()
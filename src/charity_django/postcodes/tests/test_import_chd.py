@@ -1,3 +1,4 @@
+import io
 import os
 
 import requests_mock
@@ -12,13 +13,18 @@ from charity_django.postcodes.models import GeoCode
 
 
 class TestImportCHD(TestCase):
-    def mock_csv_downloads(self, m):
+    @classmethod
+    def setUpTestData(cls):
+        # read the zip fixture once for the whole class
         dirname = os.path.dirname(__file__)
         with open(
             os.path.join(dirname, "data", "Code_History_Database_May_2023_UK.zip"),
             "rb",
         ) as a:
-            m.get(CHD_URL, content=a.read())
+            cls._fixture_bytes = a.read()
+
+    def mock_csv_downloads(self, m):
+        m.get(CHD_URL, body=io.BytesIO(self._fixture_bytes))
 
     def test_set_session(self):
         command = Command()